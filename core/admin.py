@@ -6,5 +6,19 @@ from .models import Tenant, User, Project, Task
 admin.site.register(Tenant)
 admin.site.register(Permission)
 admin.site.register(User)
-admin.site.register(Project)
-admin.site.register(Task)
\ No newline at end of file
+
+
+@admin.register(Project)
+class ProjectAdmin(admin.ModelAdmin):
+    list_display = ('name', 'tenant')
+    list_select_related = ('tenant',)
+    list_filter = ('tenant',)
+    raw_id_fields = ('tenant',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('title', 'project', 'tenant', 'is_done')
+    list_select_related = ('project', 'tenant')
+    list_filter = ('tenant', 'is_done')
+    raw_id_fields = ('project', 'tenant')
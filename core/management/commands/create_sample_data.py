@@ -2,8 +2,9 @@
 Django management command to create sample tenants, users, projects, and tasks for testing.
 Run with: python manage.py create_sample_data
 """
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
 from core.models import Tenant, User, Project, Task
 
 
@@ -19,133 +20,110 @@ class Command(BaseCommand):
             tenant2, _ = Tenant.objects.get_or_create(name="TechStart Inc")
             self.stdout.write(f"✓ Created tenants: {tenant1.name}, {tenant2.name}")
             
-            # Create Users
-            user1, created = User.objects.get_or_create(
+            # Create Users - hash each distinct password once, not once per user
+            user_password = make_password('password123')
+            admin_password = make_password('admin123')
+            
+            user1, _ = User.objects.get_or_create(
                 username="tenant1user",
                 defaults={
                     'email': 'user1@acme.com',
+                    'password': user_password,
                     'tenant': tenant1,
                     'is_staff': False,
                     'is_superuser': False
                 }
             )
-            if created:
-                user1.set_password('password123')
-                user1.save()
-            else:
-                user1.tenant = tenant1
-                user1.save()
-            
-            user2, created = User.objects.get_or_create(
+            user2, _ = User.objects.get_or_create(
                 username="tenant2user",
                 defaults={
                     'email': 'user2@techstart.com',
+                    'password': user_password,
                     'tenant': tenant2,
                     'is_staff': False,
                     'is_superuser': False
                 }
             )
-            if created:
-                user2.set_password('password123')
-                user2.save()
-            else:
-                user2.tenant = tenant2
-                user2.save()
-            
-            self.stdout.write(f"✓ Created user: {user1.username} (Tenant: {user1.tenant.name})")
-            self.stdout.write(f"✓ Created user: {user2.username} (Tenant: {user2.tenant.name})")
             
             # Create admin user without tenant (for admin panel)
-            admin, created = User.objects.get_or_create(
+            admin, _ = User.objects.get_or_create(
                 username="admin",
                 defaults={
                     'email': 'admin@example.com',
+                    'password': admin_password,
                     'is_staff': True,
                     'is_superuser': True
                 }
             )
-            if created:
-                admin.set_password('admin123')
-                admin.save()
+            
+            # Re-attach existing users to their tenant
+            moved_users = []
+            for user, tenant in ((user1, tenant1), (user2, tenant2)):
+                if user.tenant_id != tenant.id:
+                    user.tenant = tenant
+                    moved_users.append(user)
+            if moved_users:
+                User.objects.bulk_update(moved_users, ['tenant'])
+            
+            self.stdout.write(f"✓ Created user: {user1.username} (Tenant: {user1.tenant.name})")
+            self.stdout.write(f"✓ Created user: {user2.username} (Tenant: {user2.tenant.name})")
             self.stdout.write(f"✓ Created admin: {admin.username}")
             
-            # Create Projects for Tenant 1
-            project1_1, _ = Project.objects.get_or_create(
-                name="Website Redesign",
-                tenant=tenant1
-            )
-            project1_2, _ = Project.objects.get_or_create(
-                name="Mobile App Development",
-                tenant=tenant1
-            )
+            if connection.vendor == 'postgresql':
+                # Check deferrable constraints once at commit, not per statement
+                with connection.cursor() as cursor:
+                    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
             
-            # Create Projects for Tenant 2
-            project2_1, _ = Project.objects.get_or_create(
-                name="API Integration",
-                tenant=tenant2
-            )
-            project2_2, _ = Project.objects.get_or_create(
-                name="Database Migration",
-                tenant=tenant2
-            )
+            # Create Projects - a single upsert returns the PKs of new and existing rows
+            project_specs = [
+                ("Website Redesign", tenant1),
+                ("Mobile App Development", tenant1),
+                ("API Integration", tenant2),
+                ("Database Migration", tenant2),
+            ]
+            projects = {
+                (project.name, project.tenant_id): project
+                for project in Project.objects.without_tenant_filter().bulk_create(
+                    [Project(name=name, tenant=tenant) for name, tenant in project_specs],
+                    update_conflicts=True,
+                    unique_fields=['tenant', 'name'],
+                    update_fields=['name'],
+                    batch_size=500,
+                )
+            }
             
             self.stdout.write(f"\n✓ Created projects for {tenant1.name}:")
-            self.stdout.write(f"  - {project1_1.name}")
-            self.stdout.write(f"  - {project1_2.name}")
+            self.stdout.write(f"  - {project_specs[0][0]}")
+            self.stdout.write(f"  - {project_specs[1][0]}")
             self.stdout.write(f"\n✓ Created projects for {tenant2.name}:")
-            self.stdout.write(f"  - {project2_1.name}")
-            self.stdout.write(f"  - {project2_2.name}")
-            
-            # Create Tasks for Tenant 1 Projects
-            Task.objects.get_or_create(
-                title="Create wireframes",
-                project=project1_1,
-                tenant=tenant1,
-                defaults={'is_done': True}
-            )
-            Task.objects.get_or_create(
-                title="Design homepage",
-                project=project1_1,
-                tenant=tenant1,
-                defaults={'is_done': False}
-            )
-            Task.objects.get_or_create(
-                title="Setup development environment",
-                project=project1_2,
-                tenant=tenant1,
-                defaults={'is_done': True}
-            )
-            Task.objects.get_or_create(
-                title="Implement authentication",
-                project=project1_2,
-                tenant=tenant1,
-                defaults={'is_done': False}
-            )
+            self.stdout.write(f"  - {project_specs[2][0]}")
+            self.stdout.write(f"  - {project_specs[3][0]}")
             
-            # Create Tasks for Tenant 2 Projects
-            Task.objects.get_or_create(
-                title="Review API documentation",
-                project=project2_1,
-                tenant=tenant2,
-                defaults={'is_done': True}
-            )
-            Task.objects.get_or_create(
-                title="Implement webhooks",
-                project=project2_1,
-                tenant=tenant2,
-                defaults={'is_done': False}
-            )
-            Task.objects.get_or_create(
-                title="Backup current database",
-                project=project2_2,
-                tenant=tenant2,
-                defaults={'is_done': True}
-            )
-            Task.objects.get_or_create(
-                title="Test migration scripts",
-                project=project2_2,
-                tenant=tenant2,
-                defaults={'is_done': False}
+            # Create Tasks - existing tasks are left untouched
+            task_specs = [
+                # Tenant 1 Projects
+                ("Create wireframes", ("Website Redesign", tenant1), True),
+                ("Design homepage", ("Website Redesign", tenant1), False),
+                ("Setup development environment", ("Mobile App Development", tenant1), True),
+                ("Implement authentication", ("Mobile App Development", tenant1), False),
+                # Tenant 2 Projects
+                ("Review API documentation", ("API Integration", tenant2), True),
+                ("Implement webhooks", ("API Integration", tenant2), False),
+                ("Backup current database", ("Database Migration", tenant2), True),
+                ("Test migration scripts", ("Database Migration", tenant2), False),
+            ]
+            Task.objects.without_tenant_filter().bulk_create(
+                [
+                    Task(
+                        title=title,
+                        project=projects[(project_name, tenant.id)],
+                        tenant=tenant,
+                        is_done=is_done,
+                    )
+                    for title, (project_name, tenant), is_done in task_specs
+                ],
+                ignore_conflicts=True,
+                batch_size=500,
             )
             
             self.stdout.write(self.style.SUCCESS('\n✅ Sample data created successfully!'))
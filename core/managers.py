@@ -1,59 +1,100 @@
 """
 Multi-tenant managers and querysets for automatic tenant filtering.
 """
+from contextvars import ContextVar
+
 from django.db import models
 from django.db.models import QuerySet
-from threading import local
+from django.dispatch import Signal
+from django.utils.functional import cached_property
+
 
+# Context-local storage for the current tenant. Unlike threading.local(),
+# a ContextVar is also isolated between coroutines served by one thread.
+_tenant_var = ContextVar('tenant', default=None)
 
-# Thread-local storage for the current tenant
-_thread_locals = local()
+# Get the current tenant (a Tenant instance or its id) from the tenant context.
+get_current_tenant = _tenant_var.get
 
 
-def get_current_tenant():
-    """Get the current tenant from thread-local storage."""
-    return getattr(_thread_locals, 'tenant', None)
+def get_current_tenant_id():
+    """Get the current tenant's primary key, whether an instance or an id was set."""
+    tenant = _tenant_var.get()
+    return getattr(tenant, 'pk', tenant)
 
 
 def set_current_tenant(tenant):
-    """Set the current tenant in thread-local storage."""
-    _thread_locals.tenant = tenant
+    """
+    Set the current tenant in the tenant context.
+    Accepts a Tenant instance or just its id, so callers that only know the
+    id don't have to fetch the row. Returns a token that can be passed to
+    clear_current_tenant().
+    """
+    return _tenant_var.set(tenant)
+
+
+def clear_current_tenant(token=None):
+    """
+    Clear the current tenant from the tenant context.
+    If a token from set_current_tenant() is given, the previous value is restored.
+    """
+    if token is not None:
+        _tenant_var.reset(token)
+    else:
+        _tenant_var.set(None)
 
 
-def clear_current_tenant():
-    """Clear the current tenant from thread-local storage."""
-    if hasattr(_thread_locals, 'tenant'):
-        delattr(_thread_locals, 'tenant')
+# Sent after tenant rows were changed by a write that may skip the model
+# signals, with the ids of the tenants those rows belong to as tenant_ids.
+tenant_rows_changed = Signal()
 
 
 class TenantQuerySet(QuerySet):
     """
     Custom QuerySet that automatically filters by the current tenant.
     """
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._tenant_filtering_disabled = False
+    # Whether tenant filtering was turned off with without_tenant_filter()
+    _tenant_filtering_disabled = False
+    # Whether the model has a tenant field; set by TenantManager.get_queryset()
+    _has_tenant = False
+    # Whether the tenant filter has already been added to this queryset
+    _already_tenant_scoped = False
     
     def _filter_by_tenant(self):
         """Apply tenant filtering if a tenant is set and filtering is enabled."""
-        if self._tenant_filtering_disabled:
+        if self._tenant_filtering_disabled or self._already_tenant_scoped:
             return self
         
-        tenant = get_current_tenant()
-        if tenant is None:
+        tenant_id = get_current_tenant_id()
+        if tenant_id is None:
             return self
         
-        # Check if the model has a tenant field
-        if hasattr(self.model, 'tenant'):
-            return self.filter(tenant=tenant)
+        if self._has_tenant:
+            clone = self.filter(tenant_id=tenant_id)
+            clone._already_tenant_scoped = True
+            return clone
         
         return self
     
+    def _tenant_ids(self):
+        """Return the ids of the tenants this queryset's rows belong to."""
+        if not self._has_tenant:
+            return set()
+        if self._already_tenant_scoped:
+            return {get_current_tenant_id()}
+        # Unscoped (shell, admin, without_tenant_filter()), so ask the database
+        return set(self.order_by().values_list('tenant_id', flat=True).distinct())
+    
     def _chain(self, **kwargs):
         """Override _chain to maintain tenant filtering state."""
         clone = super()._chain(**kwargs)
-        clone._tenant_filtering_disabled = self._tenant_filtering_disabled
+        # The flags default to False, so only copy the ones that are set
+        if self._tenant_filtering_disabled:
+            clone._tenant_filtering_disabled = True
+        if self._has_tenant:
+            clone._has_tenant = True
+        if self._already_tenant_scoped:
+            clone._already_tenant_scoped = True
         return clone
     
     def all(self):
@@ -72,28 +113,57 @@ class TenantQuerySet(QuerySet):
     def get(self, *args, **kwargs):
         """Override get() to apply tenant filtering."""
         # Don't re-filter if we're already filtering by tenant explicitly
-        if not ('tenant' in kwargs or 'tenant__id' in kwargs or 'tenant_id' in kwargs):
-            tenant = get_current_tenant()
-            if tenant is not None and hasattr(self.model, 'tenant') and not self._tenant_filtering_disabled:
-                kwargs['tenant'] = tenant
+        if not (self._already_tenant_scoped or 'tenant' in kwargs or 'tenant__id' in kwargs or 'tenant_id' in kwargs):
+            tenant_id = get_current_tenant_id()
+            if tenant_id is not None and self._has_tenant and not self._tenant_filtering_disabled:
+                kwargs['tenant_id'] = tenant_id
         return super().get(*args, **kwargs)
     
     def create(self, **kwargs):
         """Override create() to automatically set the tenant."""
-        tenant = get_current_tenant()
-        if tenant is not None and hasattr(self.model, 'tenant') and 'tenant' not in kwargs:
-            kwargs['tenant'] = tenant
+        if self._has_tenant and 'tenant' not in kwargs and 'tenant_id' not in kwargs:
+            tenant_id = get_current_tenant_id()
+            if tenant_id is not None:
+                kwargs['tenant_id'] = tenant_id
         return super().create(**kwargs)
     
     def update(self, **kwargs):
         """Override update() to prevent changing tenant."""
         if 'tenant' in kwargs:
             raise ValueError("Cannot change tenant through update(). This is a security measure.")
-        return self._filter_by_tenant().filter(*self._result_cache if hasattr(self, '_result_cache') else []).update(**kwargs)
+        qs = self._filter_by_tenant()
+        tenant_ids = qs._tenant_ids()
+        rows = super(TenantQuerySet, qs).update(**kwargs)
+        if rows and tenant_ids:
+            tenant_rows_changed.send(sender=self.model, tenant_ids=tenant_ids)
+        return rows
     
     def delete(self):
         """Override delete() to ensure tenant filtering."""
-        return self._filter_by_tenant().filter(*self._result_cache if hasattr(self, '_result_cache') else []).delete()
+        qs = self._filter_by_tenant()
+        tenant_ids = qs._tenant_ids()
+        deleted = super(TenantQuerySet, qs).delete()
+        if deleted[0] and tenant_ids:
+            tenant_rows_changed.send(sender=self.model, tenant_ids=tenant_ids)
+        return deleted
+    
+    def bulk_create(self, objs, **kwargs):
+        """Override bulk_create() to report the new rows; it sends no post_save."""
+        objs = list(objs)
+        created = super().bulk_create(objs, **kwargs)
+        tenant_ids = {obj.tenant_id for obj in objs} if self._has_tenant else set()
+        if tenant_ids:
+            tenant_rows_changed.send(sender=self.model, tenant_ids=tenant_ids)
+        return created
+    
+    def bulk_update(self, objs, fields, **kwargs):
+        """Override bulk_update() to report the changed rows; it sends no post_save."""
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, **kwargs)
+        tenant_ids = {obj.tenant_id for obj in objs} if self._has_tenant else set()
+        if rows and tenant_ids:
+            tenant_rows_changed.send(sender=self.model, tenant_ids=tenant_ids)
+        return rows
     
     def without_tenant_filter(self):
         """
@@ -117,67 +187,93 @@ class TenantQuerySet(QuerySet):
 class TenantManager(models.Manager):
     """
     Custom Manager that uses TenantQuerySet for automatic tenant filtering.
+    
+    Every queryset it hands out, including all(), is already filtered by the
+    current tenant, so callers can freely chain select_related(),
+    prefetch_related() or only() without losing tenant isolation.
     """
     
+    @cached_property
+    def _model_has_tenant(self):
+        """Whether the model has a tenant field, resolved once per manager."""
+        return any(field.name == 'tenant' for field in self.model._meta.get_fields())
+    
+    def _unfiltered_queryset(self):
+        """Return a TenantQuerySet that has not been filtered by tenant yet."""
+        qs = TenantQuerySet(self.model, using=self._db)
+        qs._has_tenant = self._model_has_tenant
+        return qs
+    
     def get_queryset(self):
-        """Return a TenantQuerySet instead of a regular QuerySet."""
-        return TenantQuerySet(self.model, using=self._db)
+        """Return a TenantQuerySet filtered by the current tenant."""
+        if not self._model_has_tenant:
+            # Nothing to filter on, so skip the TenantQuerySet overrides entirely
+            return QuerySet(self.model, using=self._db)
+        return self._unfiltered_queryset()._filter_by_tenant()
     
     def without_tenant_filter(self):
         """
         Return a queryset without tenant filtering.
         Use with caution - this bypasses tenant isolation!
         """
-        return self.get_queryset().without_tenant_filter()
+        if not self._model_has_tenant:
+            return QuerySet(self.model, using=self._db)
+        return self._unfiltered_queryset().without_tenant_filter()
     
     def for_tenant(self, tenant):
         """
         Return a queryset filtered for a specific tenant.
         This allows cross-tenant queries when necessary.
         """
-        return self.get_queryset().for_tenant(tenant)
+        return self._unfiltered_queryset().for_tenant(tenant)
     
     def create(self, **kwargs):
         """Override create() to automatically set the tenant."""
-        tenant = get_current_tenant()
-        if tenant is not None and hasattr(self.model, 'tenant') and 'tenant' not in kwargs:
-            kwargs['tenant'] = tenant
+        if self._model_has_tenant and 'tenant' not in kwargs and 'tenant_id' not in kwargs:
+            tenant_id = get_current_tenant_id()
+            if tenant_id is not None:
+                kwargs['tenant_id'] = tenant_id
         return super().create(**kwargs)
     
     def bulk_create(self, objs, **kwargs):
         """Override bulk_create() to automatically set the tenant on all objects."""
-        tenant = get_current_tenant()
-        if tenant is not None and hasattr(self.model, 'tenant'):
-            for obj in objs:
-                if not hasattr(obj, 'tenant') or obj.tenant is None:
-                    obj.tenant = tenant
+        if self._model_has_tenant:
+            tenant_id = get_current_tenant_id()
+            if tenant_id is not None:
+                objs = list(objs)
+                for obj in objs:
+                    # tenant_id avoids the descriptor, which raises or queries
+                    if obj.tenant_id is None:
+                        obj.tenant_id = tenant_id
         return super().bulk_create(objs, **kwargs)
 
 
-class TenantModelMixin:
+class TenantModelMixin(models.Model):
     """
     Mixin for models that should use tenant filtering.
     Add this to any model that has a tenant field.
     """
     objects = TenantManager()
     
-    def save(self, *args, **kwargs):
-        """Override save() to automatically set the tenant on new objects."""
-        if self.pk is None:  # New object
-            tenant = get_current_tenant()
-            if tenant is not None and hasattr(self, 'tenant') and self.tenant is None:
-                self.tenant = tenant
-        super().save(*args, **kwargs)
+    def __init__(self, *args, **kwargs):
+        """Set the current tenant on new objects once, when they are constructed."""
+        super().__init__(*args, **kwargs)
+        # Check pk first: rows loaded from the database may have tenant_id
+        # deferred, and reading it would trigger a query.
+        if self.pk is None and self.tenant_id is None:
+            self.tenant_id = get_current_tenant_id()
     
     def delete(self, *args, **kwargs):
         """Override delete() to verify tenant before deletion."""
-        tenant = get_current_tenant()
-        if tenant is not None and hasattr(self, 'tenant') and self.tenant != tenant:
+        tenant_id = get_current_tenant_id()
+        if tenant_id is not None and self.tenant_id != tenant_id:
             raise ValueError(
-                f"Cannot delete object from tenant {self.tenant} while current tenant is {tenant}. "
+                f"Cannot delete object from tenant {self.tenant_id} while current tenant is {tenant_id}. "
                 "This is a security measure."
             )
-        return super().delete(*args, **kwargs)
+        deleted = super().delete(*args, **kwargs)
+        tenant_rows_changed.send(sender=self.__class__, tenant_ids={self.tenant_id})
+        return deleted
     
     class Meta:
         abstract = True
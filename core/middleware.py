@@ -1,23 +1,58 @@
 # core/middleware.py
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
 from .managers import set_current_tenant, clear_current_tenant
 
 
-class TenantMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        """Set the current tenant based on the authenticated user."""
-        if request.user.is_authenticated:
-            request.tenant = request.user.tenant
-            set_current_tenant(request.user.tenant)
-        else:
+class TenantMiddleware:
+    """
+    Scope each request to the authenticated user's tenant.
+
+    The tenant is set and reset within the same call, so under ASGI the
+    ContextVar token is reset in the context that created it rather than in
+    a separate sync_to_async hop as MiddlewareMixin would do.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._set_tenant(request, request.user)
+        try:
+            return self.get_response(request)
+        finally:
+            self._reset_tenant(token)
+
+    async def __acall__(self, request):
+        # Load the user without blocking the event loop; keep it on request.user
+        # so views can check it without touching the database again
+        request.user = await request.auser()
+        token = self._set_tenant(request, request.user)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._reset_tenant(token)
+
+    def _set_tenant(self, request, user):
+        """Set the current tenant based on the authenticated user; return the reset token."""
+        if not user.is_authenticated:
+            # Nothing to set, so there is nothing to reset afterwards
+            request.tenant_id = None
             request.tenant = None
-            clear_current_tenant()
-    
-    def process_response(self, request, response):
-        """Clear the tenant from thread-local storage after the request."""
-        clear_current_tenant()
-        return response
-    
-    def process_exception(self, request, exception):
-        """Clear the tenant from thread-local storage on exception."""
-        clear_current_tenant()
+            return None
+        # Only the id is needed for filtering; the Tenant row is fetched
+        # lazily if a view or template actually uses request.tenant.
+        request.tenant_id = user.tenant_id
+        request.tenant = SimpleLazyObject(lambda: user.tenant)
+        return set_current_tenant(user.tenant_id)
+
+    def _reset_tenant(self, token):
+        """Reset whatever _set_tenant set."""
+        if token is not None:
+            clear_current_tenant(token)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_project_tenant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['tenant', 'name'], name='project_tenant_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'project', 'is_done'], name='task_tenant_project_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['tenant', 'is_done'], name='task_tenant_done_idx'),
+        ),
+    ]
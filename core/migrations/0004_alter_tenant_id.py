@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-15 09:40
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tenant',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-15 10:05
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Merge rows that the new constraints would reject, keeping the oldest.
+    Earlier versions of the demo script created the same projects and tasks
+    on every run.
+    """
+    Project = apps.get_model('core', 'Project')
+    Task = apps.get_model('core', 'Task')
+
+    duplicate_projects = (
+        Project.objects.order_by().values('name', 'tenant')
+        .annotate(keep=Min('pk'), copies=Count('pk')).filter(copies__gt=1)
+    )
+    for row in duplicate_projects:
+        extra = Project.objects.filter(name=row['name'], tenant=row['tenant']).exclude(pk=row['keep'])
+        # Move the copies' tasks over first so deleting them doesn't cascade
+        Task.objects.filter(project__in=extra).update(project=row['keep'])
+        extra.delete()
+
+    duplicate_tasks = (
+        Task.objects.order_by().values('title', 'project', 'tenant')
+        .annotate(keep=Min('pk'), copies=Count('pk')).filter(copies__gt=1)
+    )
+    for row in duplicate_tasks:
+        Task.objects.filter(
+            title=row['title'], project=row['project'], tenant=row['tenant'],
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+    # Kept apart from the AddConstraint in 0006: on PostgreSQL, altering a table
+    # in the same transaction as these FK updates and deletes fails with
+    # "pending trigger events".
+
+    dependencies = [
+        ('core', '0004_alter_tenant_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-15 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_remove_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='uniq_project_name_per_tenant'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('tenant', 'project', 'title'), name='uniq_task_title_per_project'),
+        ),
+        # The project constraint's index covers the same columns as this one
+        migrations.RemoveIndex(
+            model_name='project',
+            name='project_tenant_name_idx',
+        ),
+        # The task constraint's (tenant, project, title) index serves a
+        # project's tasks in title order and bare (tenant, project) lookups;
+        # nothing reads the is_done suffix
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_tenant_project_done_idx',
+        ),
+    ]
@@ -1,10 +1,32 @@
+import os
+import time
 import uuid
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
-from .managers import TenantModelMixin
+from .managers import TenantModelMixin, tenant_rows_changed
+
+
+def uuid7():
+    """
+    Return a time-ordered UUID (RFC 9562 version 7).
+    Ids sort by creation time, so new rows land on the right-most index pages
+    instead of random ones.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80  # 48-bit Unix time in ms
+    value |= 0x7 << 76  # version
+    value |= (rand >> 62 & 0xFFF) << 64  # rand_a
+    value |= 0b10 << 62  # variant
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF  # rand_b
+    return uuid.UUID(int=value)
+
 
 class Tenant(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -62,6 +84,11 @@ class Project(TenantModelMixin, models.Model):
         ordering = ('name',)
         app_label = 'core'
         db_table = 'core_project'
+        constraints = [
+            # Tenant first, so its index also serves every tenant-scoped,
+            # name-ordered query
+            models.UniqueConstraint(fields=['tenant', 'name'], name='uniq_project_name_per_tenant'),
+        ]
 
 class Task(TenantModelMixin, models.Model):
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE)
@@ -74,3 +101,73 @@ class Task(TenantModelMixin, models.Model):
         ordering = ('title',)
         app_label = 'core'
         db_table = 'core_task'
+        indexes = [
+            models.Index(fields=['tenant', 'is_done'], name='task_tenant_done_idx'),
+        ]
+        constraints = [
+            # Its index lists a project's tasks in title order, as project_detail
+            # shows them, and serves bare (tenant, project) lookups as a prefix
+            models.UniqueConstraint(fields=['tenant', 'project', 'title'], name='uniq_task_title_per_project'),
+        ]
+
+
+def current_version(key):
+    """
+    Return the cache version stored under ``key``, starting a fresh one if the
+    key is missing (a restart, a cull or a cold worker). Never falling back to a
+    constant keeps old ETags and fragments from matching again.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            # Another request started one first; use theirs
+            version = cache.get(key, version)
+    return version
+
+
+def project_list_version_key(tenant_id):
+    """Cache key holding the version of a tenant's rendered project list."""
+    return f'projlist:ver:{tenant_id}'
+
+
+def search_version_key(tenant_id):
+    """Cache key holding the version of a tenant's searchable projects and tasks."""
+    return f'search:ver:{tenant_id}'
+
+
+def bump_search_version(tenant_id):
+    """Retire search ETags for a tenant."""
+    cache.set(search_version_key(tenant_id), time.time_ns(), None)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Tenant)
+def _bump_project_list_version(sender, instance, **kwargs):
+    # Rows show the project and tenant names, so either changing retires the fragments
+    tenant_id = instance.pk if sender is Tenant else instance.tenant_id
+    version = time.time_ns()
+    cache.set_many({
+        project_list_version_key(tenant_id): version,
+        search_version_key(tenant_id): version,
+    }, None)
+
+
+# Task deletes come through tenant_rows_changed below: a post_delete receiver
+# would stop Django from fast-deleting a project's tasks, and a cascade is
+# already covered by the project's own post_delete above.
+@receiver(post_save, sender=Task)
+def _bump_search_version(sender, instance, **kwargs):
+    bump_search_version(instance.tenant_id)
+
+
+@receiver(tenant_rows_changed, sender=Project)
+@receiver(tenant_rows_changed, sender=Task)
+def _bump_versions_for_rows(sender, tenant_ids, **kwargs):
+    # Queryset update(), delete() and bulk writes send no post_save, and Task
+    # sends no post_delete; project rows also appear in the project list
+    keys = [search_version_key(tenant_id) for tenant_id in tenant_ids]
+    if sender is Project:
+        keys += [project_list_version_key(tenant_id) for tenant_id in tenant_ids]
+    cache.set_many(dict.fromkeys(keys, time.time_ns()), None)
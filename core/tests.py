@@ -1,6 +1,10 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from core.models import Tenant, User, Project, Task
+from core.views import PROJECT_PAGE_SIZE, SEARCH_RESULTS_PER_KIND
 from core.managers import set_current_tenant, clear_current_tenant
 
 
@@ -194,6 +198,17 @@ class TenantManagerTests(TestCase):
         
         clear_current_tenant()
     
+    def test_new_instance_gets_current_tenant(self):
+        """Test that instances built while a tenant is set are saved to that tenant."""
+        set_current_tenant(self.tenant2)
+        
+        project = Project(name="Unsaved Project")
+        project.save()
+        
+        clear_current_tenant()
+        
+        self.assertEqual(project.tenant, self.tenant2)
+    
     def test_without_tenant_filter(self):
         """Test that without_tenant_filter returns all objects."""
         set_current_tenant(self.tenant1)
@@ -218,6 +233,32 @@ class TenantManagerTests(TestCase):
         self.assertEqual(projects[0], self.project2)
         
         clear_current_tenant()
+    
+    def test_update_and_delete_are_tenant_scoped(self):
+        """Test that update() and delete() only touch the current tenant's rows."""
+        set_current_tenant(self.tenant1)
+        
+        projects = Project.objects.all()
+        list(projects)  # Populate the result cache before updating
+        self.assertEqual(projects.update(name="Renamed"), 1)
+        
+        deleted, _ = Project.objects.all().delete()
+        self.assertEqual(deleted, 1)
+        
+        clear_current_tenant()
+        
+        self.project2.refresh_from_db()
+        self.assertEqual(self.project2.name, "Project 2")
+    
+    def test_chained_filters_apply_tenant_once(self):
+        """Test that chaining filter() does not repeat the tenant WHERE clause."""
+        set_current_tenant(self.tenant1)
+        
+        projects = Project.objects.filter(name__startswith="Project").filter(id=self.project1.id).all()
+        self.assertEqual(str(projects.query).count('"tenant_id" ='), 1)
+        self.assertEqual(list(projects), [self.project1])
+        
+        clear_current_tenant()
 
 
 class HTMXViewTests(TestCase):
@@ -238,7 +279,7 @@ class HTMXViewTests(TestCase):
         clear_current_tenant()
     
     def test_htmx_required_decorator(self):
-        """Test that @htmx_required views reject non-HTMX requests."""
+        """Test that @tenant_htmx_view views reject non-HTMX requests."""
         # Try to access HTMX-only view without HX-Request header
         response = self.client.get(reverse('core:project_create'))
         self.assertEqual(response.status_code, 400)
@@ -250,6 +291,15 @@ class HTMXViewTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
     
+    def test_tenant_htmx_view_checks_login_first(self):
+        """Test that HTMX views still send anonymous users to login with a next URL."""
+        self.client.logout()
+        url = reverse('core:project_create')
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login/', response.url)
+        self.assertIn('next=', response.url)
+    
     def test_htmx_partial_templates(self):
         """Test that HTMX requests return partial templates."""
         response = self.client.get(
@@ -274,6 +324,200 @@ class HTMXViewTests(TestCase):
         self.assertIn('HX-Trigger', response.headers)
         self.assertEqual(response.headers['HX-Trigger'], 'projectCreated')
     
+    def test_project_create_rejects_duplicate_name(self):
+        """Test that project names are unique within a tenant."""
+        response = self.client.post(
+            reverse('core:project_create'),
+            {'name': 'Test Project'},
+            HTTP_HX_REQUEST='true'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Project.objects.without_tenant_filter().filter(name='Test Project').count(), 1)
+    
+    def test_search_lists_matching_tasks_only(self):
+        """Test that search renders matching tasks and skips empty sections."""
+        set_current_tenant(self.tenant)
+        Task.objects.create(title="Write docs", project=self.project)
+        clear_current_tenant()
+        
+        response = self.client.get(reverse('core:search') + '?q=docs', HTTP_HX_REQUEST='true')
+        
+        self.assertContains(response, "Write docs")
+        self.assertContains(response, "Test Project")
+        self.assertNotContains(response, ">Projects<")
+        
+        response = self.client.get(reverse('core:search') + '?q=nothing', HTTP_HX_REQUEST='true')
+        self.assertEqual(response.content.strip(), b'')
+    
+    def test_search_limits_projects_and_tasks_separately(self):
+        """Test that many matching projects don't crowd matching tasks out of the search."""
+        set_current_tenant(self.tenant)
+        Project.objects.bulk_create(
+            Project(name=f"Alpha {i:03}") for i in range(SEARCH_RESULTS_PER_KIND + 5)
+        )
+        Task.objects.create(title="Alpha task", project=self.project)
+        clear_current_tenant()
+        
+        response = self.client.get(reverse('core:search') + '?q=Alpha', HTTP_HX_REQUEST='true')
+        
+        self.assertContains(response, "Alpha task")
+        self.assertEqual(len(response.context['projects']), SEARCH_RESULTS_PER_KIND)
+    
+    def test_search_answers_repeat_query_with_304(self):
+        """Test that a repeated search revalidates to 304 until a task changes."""
+        task = Task.objects.create(title="Test Task", project=self.project, tenant=self.tenant)
+        url = reverse('core:search') + '?q=Test'
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        etag = response['ETag']
+        
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.client.post(
+            reverse('core:task_toggle', kwargs={'task_id': task.id}),
+            HTTP_HX_REQUEST='true'
+        )
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_search_etag_changes_when_tasks_change_outside_the_views(self):
+        """Test that task writes from the shell or admin also retire search ETags."""
+        task = Task.objects.create(title="Test Task", project=self.project, tenant=self.tenant)
+        url = reverse('core:search') + '?q=Test'
+        etag = self.client.get(url, HTTP_HX_REQUEST='true')['ETag']
+        
+        Task.objects.without_tenant_filter().filter(id=task.id).update(is_done=True)
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        etag = response['ETag']
+        task.delete()
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Test Task")
+    
+    def test_search_etag_survives_losing_the_cache(self):
+        """Test that an emptied cache starts a new search version instead of reusing old ETags."""
+        url = reverse('core:search') + '?q=Fresh'
+        cache.clear()
+        etag = self.client.get(url, HTTP_HX_REQUEST='true')['ETag']
+        
+        Project.objects.create(name="Fresh Project", tenant=self.tenant)
+        cache.clear()
+        
+        response = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Fresh Project")
+    
+    async def test_search_under_asgi_respects_tenant(self):
+        """Test that the async search sees the request's tenant when served over ASGI."""
+        other_tenant = await Tenant.objects.acreate(name="Other Tenant")
+        await Project.objects.acreate(name="Other Test Project", tenant=other_tenant)
+        await self.async_client.aforce_login(self.user)
+        
+        response = await self.async_client.get(
+            reverse('core:search'), {'q': 'Test'}, headers={'HX-Request': 'true'}
+        )
+        
+        self.assertContains(response, "Test Project")
+        self.assertNotContains(response, "Other Test Project")
+    
+    def test_project_detail_query_count(self):
+        """Test that project detail doesn't issue a query per task."""
+        set_current_tenant(self.tenant)
+        for title in ("Task A", "Task B", "Task C"):
+            Task.objects.create(title=title, project=self.project)
+        clear_current_tenant()
+        
+        # Session, user, project joined with tenant, tasks joined with tenant
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse('core:project_detail', kwargs={'project_id': self.project.id})
+            )
+        
+        self.assertContains(response, "Task C")
+    
+    def test_tenant_resolution_needs_no_query(self):
+        """Test that resolving the tenant for a request doesn't query core_tenant."""
+        # Only the session and the user are loaded; the tenant id comes off the user row
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('core:search') + '?q=', HTTP_HX_REQUEST='true')
+        
+        self.assertEqual(response.status_code, 200)
+    
+    def test_project_list_streams_tenant_rows(self):
+        """Test that the HTMX project list streams only the tenant's project rows."""
+        other_tenant = Tenant.objects.create(name="Other Tenant")
+        Project.objects.create(name="Other Project", tenant=other_tenant)
+        
+        response = self.client.get(reverse('core:project_list'), HTTP_HX_REQUEST='true')
+        content = b''.join(response.streaming_content).decode()
+        
+        self.assertIn("Test Project", content)
+        self.assertNotIn("Other Project", content)
+    
+    def test_project_list_is_cached_until_a_project_changes(self):
+        """Test that a repeat project list skips the database until a project is saved."""
+        url = reverse('core:project_list')
+        b''.join(self.client.get(url, HTTP_HX_REQUEST='true').streaming_content)
+        
+        # Only the session and the user are loaded
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertContains(response, "Test Project")
+        
+        Project.objects.create(name="Another Project", tenant=self.tenant)
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertIn("Another Project", b''.join(response.streaming_content).decode())
+    
+    def test_project_list_is_retired_by_bulk_and_queryset_writes(self):
+        """Test that bulk_create() and update() on projects also retire cached project lists."""
+        url = reverse('core:project_list')
+        b''.join(self.client.get(url, HTTP_HX_REQUEST='true').streaming_content)
+        
+        Project.objects.bulk_create([Project(name="Bulk Project", tenant=self.tenant)])
+        content = self.client.get(url, HTTP_HX_REQUEST='true').getvalue().decode()
+        self.assertIn("Bulk Project", content)
+        
+        Project.objects.without_tenant_filter().filter(name="Bulk Project").update(name="Renamed Project")
+        content = self.client.get(url, HTTP_HX_REQUEST='true').getvalue().decode()
+        self.assertIn("Renamed Project", content)
+    
+    def test_project_list_pages_by_name_cursor(self):
+        """Test that the dashboard shows one page and project_list serves the next."""
+        Project.objects.bulk_create(
+            Project(name=f"Project {i:03d}", tenant=self.tenant) for i in range(PROJECT_PAGE_SIZE)
+        )
+        
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertContains(response, 'hx-trigger="revealed"')
+        self.assertNotContains(response, "Test Project")
+        
+        cursor = f"Project {PROJECT_PAGE_SIZE - 1:03d}"
+        response = self.client.get(
+            reverse('core:project_list'), {'cursor': cursor}, HTTP_HX_REQUEST='true'
+        )
+        content = b''.join(response.streaming_content).decode()
+        
+        self.assertIn("Test Project", content)
+        self.assertNotIn(cursor, content)
+        self.assertNotIn('hx-trigger="revealed"', content)
+    
+    def test_project_edit_updates_only_name(self):
+        """Test that editing a project writes just the name column."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('core:project_edit', kwargs={'project_id': self.project.id}),
+                {'name': 'Renamed Project'},
+                HTTP_HX_REQUEST='true'
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_project"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"tenant_id" =', updates[0].split('WHERE')[0])
+    
     def test_task_toggle(self):
         """Test toggling task completion status via HTMX."""
         set_current_tenant(self.tenant)
@@ -296,4 +540,42 @@ class HTMXViewTests(TestCase):
         # Check task was toggled
         task.refresh_from_db()
         self.assertTrue(task.is_done)
+    
+    def test_project_delete(self):
+        """Test deleting a project removes it and its tasks, but only within the tenant."""
+        Task.objects.create(title="Doomed Task", project=self.project, tenant=self.tenant)
+        other_tenant = Tenant.objects.create(name="Other Tenant")
+        other_project = Project.objects.create(name="Other Project", tenant=other_tenant)
+        
+        response = self.client.delete(
+            reverse('core:project_delete', kwargs={'project_id': other_project.id}),
+            HTTP_HX_REQUEST='true'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Project.objects.without_tenant_filter().filter(id=other_project.id).exists())
+        
+        # Session, user, select the project, then one DELETE each for its tasks
+        # and itself: the tasks are fast-deleted, not loaded row by row
+        with self.assertNumQueries(5):
+            response = self.client.delete(
+                reverse('core:project_delete', kwargs={'project_id': self.project.id}),
+                HTTP_HX_REQUEST='true'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['HX-Trigger'], 'projectDeleted')
+        self.assertFalse(Task.objects.without_tenant_filter().filter(project_id=self.project.id).exists())
+    
+    def test_task_toggle_other_tenant_returns_404(self):
+        """Test that toggling another tenant's task leaves it untouched."""
+        other_tenant = Tenant.objects.create(name="Other Tenant")
+        other_project = Project.objects.create(name="Other Project", tenant=other_tenant)
+        other_task = Task.objects.create(title="Other Task", project=other_project, tenant=other_tenant)
+        
+        response = self.client.post(
+            reverse('core:task_toggle', kwargs={'task_id': other_task.id}),
+            HTTP_HX_REQUEST='true'
+        )
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Task.objects.without_tenant_filter().get(id=other_task.id).is_done)
 
@@ -1,36 +1,133 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.contrib.auth.views import redirect_to_login
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template import loader
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_http_methods
 from django.contrib import messages
-from .models import Project, Task
+from django.core.cache import cache
+from .models import Project, Task, current_version, project_list_version_key, search_version_key
 from .managers import get_current_tenant
 
 
+# HTMX partials are resolved once at import instead of on every request.
+# The row partials use no request data, so they are rendered without a
+# request: that skips building a RequestContext and running every context
+# processor, which the streaming list would otherwise do once per row.
+PROJECT_ROW_TMPL = loader.get_template('core/partials/project_row.html')
+PROJECT_FORM_TMPL = loader.get_template('core/partials/project_form.html')
+TASK_ROW_TMPL = loader.get_template('core/partials/task_row.html')
+TASK_FORM_TMPL = loader.get_template('core/partials/task_form.html')
+PROJECT_MORE_TMPL = loader.get_template('core/partials/project_list_more.html')
+
+# Projects rendered per page of the dashboard list
+PROJECT_PAGE_SIZE = 50
+
+# Seconds a rendered project list page is kept; saves retire it sooner
+PROJECT_LIST_CACHE_TIMEOUT = 300
+
+# Matches shown per kind (projects, tasks) in the search dropdown
+SEARCH_RESULTS_PER_KIND = 50
+
+
 # ============================================================================
 # HTMX Helper Decorators and Functions
 # ============================================================================
 
-def htmx_required(view_func):
-    """Decorator to ensure the request is from HTMX."""
-    def wrapper(request, *args, **kwargs):
-        if not request.headers.get('HX-Request'):
-            return HttpResponse('HTMX request required', status=400)
-        return view_func(request, *args, **kwargs)
-    return wrapper
+def _is_htmx(request):
+    """Whether ``request`` was sent by HTMX."""
+    # Read META directly rather than building the request.headers wrapper
+    return request.META.get('HTTP_HX_REQUEST') == 'true'
 
 
 def tenant_check(view_func):
     """Decorator to ensure a tenant is set."""
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
             return redirect('login')
-        if not request.tenant:
+        if request.tenant_id is None:
             return HttpResponse('No tenant associated with user', status=403)
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
+def _reject_tenant_htmx_request(request):
+    """Return the response refusing ``request``, or None if it may proceed."""
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if request.tenant_id is None:
+        return HttpResponse('No tenant associated with user', status=403)
+    if not _is_htmx(request):
+        return HttpResponse('HTMX request required', status=400)
+    return None
+
+
+def tenant_htmx_view(view_func):
+    """
+    Decorator for the per-keystroke HTMX views: login required, then a tenant,
+    then an HX-Request header, checked in a single wrapper frame.
+    Works on both sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        async def wrapper(request, *args, **kwargs):
+            rejection = _reject_tenant_htmx_request(request)
+            if rejection is not None:
+                return rejection
+            return await view_func(request, *args, **kwargs)
+    else:
+        def wrapper(request, *args, **kwargs):
+            rejection = _reject_tenant_htmx_request(request)
+            if rejection is not None:
+                return rejection
+            return view_func(request, *args, **kwargs)
+    return wraps(view_func)(wrapper)
+
+
+def _project_page(cursor=''):
+    """
+    One page of projects after ``cursor`` (a project name), plus one extra row.
+    
+    Names are unique per tenant and the list is ordered by name, so the last
+    name on a page is a stable keyset cursor served by the (tenant, name)
+    unique index.
+    The extra row only tells the caller whether another page follows.
+    """
+    projects = Project.objects.select_related('tenant').only('id', 'name', 'tenant__name')
+    if cursor:
+        projects = projects.filter(name__gt=cursor)
+    return projects.order_by('name')[:PROJECT_PAGE_SIZE + 1]
+
+
+def _stream_project_rows(projects):
+    """Render a project page row by row, ending with a load-more sentinel if needed."""
+    last = None
+    for index, project in enumerate(projects.iterator()):
+        if index == PROJECT_PAGE_SIZE:
+            yield PROJECT_MORE_TMPL.render({'cursor': last.name})
+            break
+        yield PROJECT_ROW_TMPL.render({'project': project})
+        last = project
+
+
+def _cache_stream(key, chunks, timeout):
+    """Pass ``chunks`` through unchanged and cache their concatenation once exhausted."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(parts), timeout)
+
+
 # ============================================================================
 # Dashboard Views
 # ============================================================================
@@ -39,9 +136,13 @@ def tenant_check(view_func):
 @tenant_check
 def dashboard(request):
     """Main dashboard view."""
-    projects = Project.objects.all()  # Automatically filtered by tenant
+    # Automatically filtered by tenant; further pages load from project_list
+    page = list(_project_page())
+    projects = page[:PROJECT_PAGE_SIZE]
     context = {
         'projects': projects,
+        'project_count': Project.objects.count(),
+        'next_cursor': projects[-1].name if len(page) > PROJECT_PAGE_SIZE else None,
         'tenant': request.tenant,
     }
     return render(request, 'core/dashboard.html', context)
@@ -55,19 +156,31 @@ def dashboard(request):
 @tenant_check
 def project_list(request):
     """List all projects for the current tenant."""
-    projects = Project.objects.all()
-    context = {'projects': projects}
+    # The full-page project list lives on the dashboard
+    if not _is_htmx(request):
+        return redirect('core:dashboard')
     
-    # Return partial template for HTMX requests
-    if request.headers.get('HX-Request'):
-        return render(request, 'core/partials/project_list.html', context)
+    # Pages are shared by the tenant's users and keyed on a version bumped
+    # whenever a project or the tenant itself is saved or deleted
+    cursor = request.GET.get('cursor', '')
+    version = current_version(project_list_version_key(request.tenant_id))
+    key = 'projlist:{}:{}:{}'.format(
+        request.tenant_id, version, hashlib.md5(cursor.encode()).hexdigest()
+    )
+    html = cache.get(key)
+    if html is not None:
+        return HttpResponse(html)
     
-    return render(request, 'core/project_list.html', context)
+    # Built here so the tenant filter is applied before the response leaves
+    # the middleware; rows are then fetched and rendered as they stream out.
+    projects = _project_page(cursor)
+    rows = _stream_project_rows(projects)
+    return StreamingHttpResponse(
+        _cache_stream(key, rows, PROJECT_LIST_CACHE_TIMEOUT), content_type='text/html'
+    )
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 def project_create(request):
     """Create a new project (HTMX only)."""
     if request.method == 'POST':
@@ -80,25 +193,33 @@ def project_create(request):
             )
         
         # Create project - tenant is automatically set
-        project = Project.objects.create(name=name)
+        try:
+            with transaction.atomic():
+                project = Project.objects.create(name=name)
+        except IntegrityError:
+            return HttpResponse(
+                '<div class="error">A project with this name already exists</div>',
+                status=400
+            )
         
         # Return the new project row
         context = {'project': project}
-        response = render(request, 'core/partials/project_row.html', context)
+        response = HttpResponse(PROJECT_ROW_TMPL.render(context))
         response['HX-Trigger'] = 'projectCreated'
         return response
     
     # Return the create form
-    return render(request, 'core/partials/project_form.html')
+    return HttpResponse(PROJECT_FORM_TMPL.render({}, request))
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 def project_edit(request, project_id):
     """Edit a project (HTMX only)."""
     # get_object_or_404 automatically filters by tenant
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(
+        Project.objects.select_related('tenant').only('id', 'name', 'tenant__name'),
+        id=project_id,
+    )
     
     if request.method == 'POST':
         name = request.POST.get('name', '').strip()
@@ -110,28 +231,34 @@ def project_edit(request, project_id):
             )
         
         project.name = name
-        project.save()
+        try:
+            with transaction.atomic():
+                project.save(update_fields=['name'])
+        except IntegrityError:
+            return HttpResponse(
+                '<div class="error">A project with this name already exists</div>',
+                status=400
+            )
         
         # Return updated project row
         context = {'project': project}
-        response = render(request, 'core/partials/project_row.html', context)
+        response = HttpResponse(PROJECT_ROW_TMPL.render(context))
         response['HX-Trigger'] = 'projectUpdated'
         return response
     
     # Return the edit form
     context = {'project': project}
-    return render(request, 'core/partials/project_form.html', context)
+    return HttpResponse(PROJECT_FORM_TMPL.render(context, request))
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 @require_http_methods(['DELETE'])
 def project_delete(request, project_id):
     """Delete a project (HTMX only)."""
-    # get_object_or_404 automatically filters by tenant
-    project = get_object_or_404(Project, id=project_id)
-    project.delete()
+    # Delete straight from the tenant-scoped queryset; no row means not ours
+    deleted, _ = Project.objects.filter(id=project_id).delete()
+    if not deleted:
+        raise Http404("No Project matches the given query.")
     
     # Return empty response with trigger
     response = HttpResponse('')
@@ -144,15 +271,26 @@ def project_delete(request, project_id):
 def project_detail(request, project_id):
     """View project details with tasks."""
     # get_object_or_404 automatically filters by tenant
-    project = get_object_or_404(Project, id=project_id)
-    tasks = Task.objects.filter(project=project)  # Also auto-filtered by tenant
+    project = get_object_or_404(
+        Project.objects.select_related('tenant').only('id', 'name', 'tenant__name'),
+        id=project_id,
+    )
+    # Also auto-filtered by tenant; evaluated once so the stats don't re-query
+    tasks = list(
+        Task.objects.filter(project=project)
+        .select_related('tenant')
+        .only('id', 'title', 'is_done', 'project_id', 'tenant__name')
+    )
+    done_count = sum(task.is_done for task in tasks)
     
     context = {
         'project': project,
         'tasks': tasks,
+        'done_count': done_count,
+        'open_count': len(tasks) - done_count,
     }
     
-    if request.headers.get('HX-Request'):
+    if _is_htmx(request):
         return render(request, 'core/partials/project_detail.html', context)
     
     return render(request, 'core/project_detail.html', context)
@@ -162,13 +300,11 @@ def project_detail(request, project_id):
 # Task Views
 # ============================================================================
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 def task_create(request, project_id):
     """Create a new task for a project (HTMX only)."""
     # Ensure project belongs to current tenant
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.only('id'), id=project_id)
     
     if request.method == 'POST':
         title = request.POST.get('title', '').strip()
@@ -180,47 +316,58 @@ def task_create(request, project_id):
             )
         
         # Create task - tenant is automatically set
-        task = Task.objects.create(
-            project=project,
-            title=title,
-            is_done=False
-        )
+        try:
+            with transaction.atomic():
+                task = Task.objects.create(
+                    project=project,
+                    title=title,
+                    is_done=False
+                )
+        except IntegrityError:
+            return HttpResponse(
+                '<div class="error">A task with this title already exists</div>',
+                status=400
+            )
         
         # Return the new task row
         context = {'task': task}
-        response = render(request, 'core/partials/task_row.html', context)
+        response = HttpResponse(TASK_ROW_TMPL.render(context))
         response['HX-Trigger'] = 'taskCreated'
         return response
     
     # Return the create form
     context = {'project': project}
-    return render(request, 'core/partials/task_form.html', context)
+    return HttpResponse(TASK_FORM_TMPL.render(context, request))
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 def task_toggle(request, task_id):
     """Toggle task completion status (HTMX only)."""
-    # get_object_or_404 automatically filters by tenant
-    task = get_object_or_404(Task, id=task_id)
-    task.is_done = not task.is_done
-    task.save()
+    # Flip the flag in the database so concurrent toggles can't lose an update
+    if not Task.objects.filter(id=task_id).update(is_done=~F('is_done')):
+        raise Http404("No Task matches the given query.")
+    task = Task.objects.select_related('tenant').only(
+        'id', 'title', 'is_done', 'tenant__name'
+    ).filter(id=task_id).first()
+    if task is None:
+        # Deleted between the update and this read
+        raise Http404("No Task matches the given query.")
     
     # Return updated task row
     context = {'task': task}
-    response = render(request, 'core/partials/task_row.html', context)
+    response = HttpResponse(TASK_ROW_TMPL.render(context))
     response['HX-Trigger'] = 'taskToggled'
     return response
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 def task_edit(request, task_id):
     """Edit a task (HTMX only)."""
     # get_object_or_404 automatically filters by tenant
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(
+        Task.objects.select_related('tenant').only('id', 'title', 'is_done', 'tenant__name'),
+        id=task_id,
+    )
     
     if request.method == 'POST':
         title = request.POST.get('title', '').strip()
@@ -232,28 +379,34 @@ def task_edit(request, task_id):
             )
         
         task.title = title
-        task.save()
+        try:
+            with transaction.atomic():
+                task.save(update_fields=['title'])
+        except IntegrityError:
+            return HttpResponse(
+                '<div class="error">A task with this title already exists</div>',
+                status=400
+            )
         
         # Return updated task row
         context = {'task': task}
-        response = render(request, 'core/partials/task_row.html', context)
+        response = HttpResponse(TASK_ROW_TMPL.render(context))
         response['HX-Trigger'] = 'taskUpdated'
         return response
     
     # Return the edit form
     context = {'task': task}
-    return render(request, 'core/partials/task_form.html', context)
+    return HttpResponse(TASK_FORM_TMPL.render(context, request))
 
 
-@login_required
-@tenant_check
-@htmx_required
+@tenant_htmx_view
 @require_http_methods(['DELETE'])
 def task_delete(request, task_id):
     """Delete a task (HTMX only)."""
-    # get_object_or_404 automatically filters by tenant
-    task = get_object_or_404(Task, id=task_id)
-    task.delete()
+    # Delete straight from the tenant-scoped queryset; no row means not ours
+    deleted, _ = Task.objects.filter(id=task_id).delete()
+    if not deleted:
+        raise Http404("No Task matches the given query.")
     
     # Return empty response with trigger
     response = HttpResponse('')
@@ -265,23 +418,46 @@ def task_delete(request, task_id):
 # Search View (Tenant-Safe)
 # ============================================================================
 
-@login_required
-@tenant_check
-@htmx_required
-def search(request):
-    """Search projects and tasks within current tenant."""
+def _search_etag(request):
+    """ETag for a search: same tenant, same data version and same query."""
+    version = current_version(search_version_key(request.tenant_id))
+    query = request.GET.get('q', '').strip()
+    return hashlib.md5(f'{request.tenant_id}:{version}:{query}'.encode()).hexdigest()
+
+
+@tenant_htmx_view
+@cache_control(private=True, no_cache=True)
+@etag(_search_etag)
+async def search(request):
+    """
+    Search projects and tasks within current tenant.
+    Async so it can await the database under ASGI; the tenant ContextVar set
+    by TenantMiddleware follows the coroutine.
+    """
     query = request.GET.get('q', '').strip()
     
     if not query:
         return HttpResponse('')
     
-    # Both queries automatically filtered by tenant
-    projects = Project.objects.filter(name__icontains=query)
-    tasks = Task.objects.filter(title__icontains=query)
-    
+    # Both queries automatically filtered by tenant and limited on their own,
+    # so many matching projects can't crowd the tasks out of the results.
+    # SQLite can't slice the branches of a UNION, hence two queries.
+    projects = Project.objects.filter(name__icontains=query).values(
+        'id',
+        label=F('name'),
+        tenant_name=F('tenant__name'),
+    )
+    tasks = Task.objects.filter(title__icontains=query).values(
+        'id',
+        label=F('title'),
+        parent_id=F('project_id'),
+        parent_name=F('project__name'),
+        tenant_name=F('tenant__name'),
+        done=F('is_done'),
+    )
     context = {
-        'projects': projects,
-        'tasks': tasks,
+        'projects': [row async for row in projects.order_by('label')[:SEARCH_RESULTS_PER_KIND]],
+        'tasks': [row async for row in tasks.order_by('label')[:SEARCH_RESULTS_PER_KIND]],
         'query': query,
     }
     
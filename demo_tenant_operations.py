@@ -11,6 +11,8 @@ This script demonstrates:
 4. Common patterns and best practices
 """
 
+from django.db import transaction
+
 from core.models import Tenant, User, Project, Task
 from core.managers import set_current_tenant, clear_current_tenant, get_current_tenant
 
@@ -72,27 +74,28 @@ print("=" * 70)
 print("\n📝 Creating a new project for Acme Corp...")
 set_current_tenant(tenant1)
 
-# Create project - tenant is automatically set!
-new_project = Project.objects.create(name="Demo Project - Acme")
-print(f"   Created: {new_project.name}")
+# The project and its tasks are committed together
+with transaction.atomic():
+    # Create project - tenant is automatically set! Names are unique per
+    # tenant, so a re-run picks up the project from the last run instead.
+    new_project, created = Project.objects.get_or_create(name="Demo Project - Acme")
+    
+    if created:
+        # Create some tasks for the project in a single INSERT
+        demo_tasks = Task.objects.bulk_create([
+            Task(title="Design mockups", project=new_project, is_done=False),
+            Task(title="Review requirements", project=new_project, is_done=True),
+        ])
+    else:
+        demo_tasks = list(Task.objects.filter(project=new_project))
+print(f"   {'Created' if created else 'Already exists'}: {new_project.name}")
 print(f"   Tenant automatically set to: {new_project.tenant.name}")
-
-# Create some tasks for the project
-task1 = Task.objects.create(
-    title="Design mockups",
-    project=new_project,
-    is_done=False
-)
-print(f"\n   Created task: {task1.title}")
-print(f"   Task tenant automatically set to: {task1.tenant.name}")
-
-task2 = Task.objects.create(
-    title="Review requirements",
-    project=new_project,
-    is_done=True
-)
-print(f"   Created task: {task2.title}")
-print(f"   Task tenant automatically set to: {task2.tenant.name}")
+print()
+for task in demo_tasks:
+    print(f"   {'Created' if created else 'Found'} task: {task.title}")
+# Every task was stamped with the current tenant in memory, no reload needed
+assert all(task.tenant_id == tenant1.pk for task in demo_tasks)
+print(f"   Task tenant automatically set to: {tenant1.name}")
 
 clear_current_tenant()
 
@@ -139,13 +142,11 @@ print("\n🔗 Tenant filtering works with all QuerySet operations:")
 print(f"   Project.objects.filter(name__contains='Demo').count() = ", end="")
 print(Project.objects.filter(name__contains='Demo').count())
 
-# Get (safe - returns 404 if wrong tenant)
-try:
-    demo_proj = Project.objects.get(name__contains='Demo')
-    print(f"   Project.objects.get(name__contains='Demo') = {demo_proj.name}")
-except Project.MultipleObjectsReturned:
-    print("   Multiple projects found (this is expected)")
-except Project.DoesNotExist:
+# First match (LIMIT 1); any of several matches will do, so no get()
+demo_proj = Project.objects.filter(name__contains='Demo').only('id', 'name').first()
+if demo_proj is not None:
+    print(f"   Project.objects.filter(name__contains='Demo').first() = {demo_proj.name}")
+else:
     print("   No matching project found")
 
 # Count tasks
@@ -167,6 +168,9 @@ print("=" * 70)
 
 set_current_tenant(tenant2)
 
+# Drop the project a previous run saved; names are unique per tenant
+Project.objects.filter(name="Demo Project - TechStart").delete()
+
 print("\n💾 Creating project instance without explicit tenant...")
 project_obj = Project(name="Demo Project - TechStart")
 print(f"   Before save - tenant: {project_obj.tenant}")
@@ -188,7 +192,8 @@ print("=" * 70)
 set_current_tenant(tenant1)
 
 print("\n📦 Creating multiple tasks using bulk_create...")
-project_for_bulk = Project.objects.first()
+# Ordered by name within the tenant, so the (tenant, name) unique index answers it
+project_for_bulk = Project.objects.only('id', 'name').first()
 print(f"   Project: {project_for_bulk.name}")
 
 tasks_to_create = [
@@ -196,13 +201,15 @@ tasks_to_create = [
     for i in range(1, 4)
 ]
 
-created_tasks = Task.objects.bulk_create(tasks_to_create)
-print(f"   Created {len(created_tasks)} tasks")
+# ignore_conflicts makes the database skip titles a previous run already inserted
+bulk_tasks = Task.objects.bulk_create(tasks_to_create, ignore_conflicts=True)
+print(f"   Sent {len(bulk_tasks)} tasks in one INSERT (titles that already exist are skipped)")
 
-# Verify tenant was set automatically
-for task in created_tasks:
-    task.refresh_from_db()
-    print(f"     - {task.title} (Tenant: {task.tenant.name})")
+# Verify tenant was set automatically; it's stamped in memory, no reload needed
+assert all(task.tenant_id == tenant1.pk for task in bulk_tasks)
+print(f"   Tenant: {tenant1.name}")
+for task in bulk_tasks:
+    print(f"     - {task.title}")
 
 clear_current_tenant()
 
@@ -215,7 +222,7 @@ print("=" * 70)
 
 # Get a project from tenant2
 set_current_tenant(tenant2)
-tenant2_project = Project.objects.first()
+tenant2_project = Project.objects.only('id', 'name').first()
 tenant2_project_id = tenant2_project.id
 print(f"\n📌 Found project in TechStart Inc: {tenant2_project.name} (ID: {tenant2_project_id})")
 
@@ -242,7 +249,7 @@ print("=" * 70)
 
 print("\n✅ Key Takeaways:")
 print("   1. Tenant filtering happens automatically on all queries")
-print("   2. set_current_tenant() sets the context for the current thread")
+print("   2. set_current_tenant() sets the context for the current request or task")
 print("   3. Objects created automatically get the current tenant")
 print("   4. Cross-tenant access is blocked by default (DoesNotExist)")
 print("   5. Use without_tenant_filter() only when absolutely necessary")
@@ -251,7 +258,7 @@ print("   7. Always clear_current_tenant() when done")
 
 print("\n🔒 Security Features:")
 print("   ✓ Automatic query filtering at ORM level")
-print("   ✓ Thread-local storage for tenant context")
+print("   ✓ ContextVar-based tenant context (safe across threads and coroutines)")
 print("   ✓ Tenant auto-assignment on create")
 print("   ✓ Protection against accidental cross-tenant access")
 print("   ✓ Clean separation of tenant data")
@@ -121,6 +121,16 @@ STATIC_URL = 'static/'
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
 
+# Holds the per-tenant versions behind the project list fragments and the
+# search ETags. Local memory is per process: with more than one worker, point
+# this at a shared backend (Redis, Memcached) or a worker that missed a write
+# keeps answering with the old version.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Login/Logout URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'core:dashboard'